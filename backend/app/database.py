@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, String, Float, Integer, DateTime
+from sqlalchemy import create_engine, event, func, text, Column, String, Float, Integer, DateTime
 from sqlalchemy.orm import declarative_base, sessionmaker
 from datetime import datetime
 
@@ -9,6 +9,19 @@ engine = create_engine(
     connect_args={"check_same_thread": False}
 )
 
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragma(dbapi_connection, connection_record):
+    # WAL lets /history/ reads run alongside upload writes, and
+    # synchronous=NORMAL defers fsync to checkpoints instead of every commit
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.close()
+
+
 SessionLocal = sessionmaker(bind=engine)
 Base = declarative_base()
 
@@ -17,7 +30,7 @@ class SuspiciousHistory(Base):
     __tablename__ = "suspicious_history"
 
     id = Column(Integer, primary_key=True, index=True)
-    account_id = Column(String, index=True)
+    account_id = Column(String, unique=True, index=True)
     last_score = Column(Float)
     times_flagged = Column(Integer)
     last_flagged_at = Column(DateTime, default=datetime.utcnow)
@@ -25,3 +38,81 @@ class SuspiciousHistory(Base):
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+
+    with engine.begin() as connection:
+        _migrate_unique_account_index(connection)
+
+
+# Per-account rows, newest first, with the account's total flag count
+_RANKED_HISTORY_SQL = """
+    WITH ranked AS (
+        SELECT
+            id,
+            SUM(times_flagged) OVER (PARTITION BY account_id) AS total_flagged,
+            ROW_NUMBER() OVER (
+                PARTITION BY account_id
+                ORDER BY last_flagged_at DESC, id DESC
+            ) AS row_rank
+        FROM suspicious_history
+        WHERE account_id IS NOT NULL
+    )
+"""
+
+
+def _migrate_unique_account_index(connection):
+    """
+    Databases created before account_id became unique only have a plain
+    index, which the history upsert cannot use as its conflict target.
+    Collapses duplicate account rows (summing times_flagged, keeping the
+    latest score and timestamp) and rebuilds the index as UNIQUE.
+    """
+
+    indexes = connection.execute(
+        text("PRAGMA index_list(suspicious_history)")
+    ).fetchall()
+
+    # PRAGMA index_list rows: (seq, name, unique, origin, partial)
+    if any(
+        row[1] == "ix_suspicious_history_account_id" and row[2]
+        for row in indexes
+    ):
+        return
+
+    connection.execute(text(_RANKED_HISTORY_SQL + """
+        UPDATE suspicious_history
+        SET times_flagged = (
+            SELECT total_flagged FROM ranked
+            WHERE ranked.id = suspicious_history.id
+        )
+        WHERE id IN (SELECT id FROM ranked WHERE row_rank = 1)
+    """))
+
+    connection.execute(text(_RANKED_HISTORY_SQL + """
+        DELETE FROM suspicious_history
+        WHERE id IN (SELECT id FROM ranked WHERE row_rank > 1)
+    """))
+
+    connection.execute(text(
+        "DROP INDEX IF EXISTS ix_suspicious_history_account_id"
+    ))
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_suspicious_history_account_id "
+        "ON suspicious_history (account_id)"
+    ))
+
+
+def warm_history_cache():
+    """
+    Scans the suspicion history table so its pages are already cached
+    when an upload is scored. Best-effort: errors are printed, not raised.
+    """
+    db = SessionLocal()
+    try:
+        db.query(
+            func.count(SuspiciousHistory.account_id),
+            func.sum(SuspiciousHistory.times_flagged)
+        ).one()
+    except Exception as e:
+        print("⚠️ History cache warm-up skipped:", e)
+    finally:
+        db.close()
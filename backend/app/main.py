@@ -1,21 +1,26 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import shutil
+import asyncio
+import aiofiles
 import os
 import pandas as pd
 import numpy as np
-import networkx as nx
 import time
+import uuid
+import pyarrow.parquet as pq
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from app.services.graph_builder import build_transaction_graph
+from app.services.centrality import compute_centralities
 from app.services.cycle_detector import detect_cycles
 from app.services.ring_manager import assign_ring_ids
 from app.services.smurf_detector import detect_smurfing
 from app.services.shell_detector import detect_shell_chains
 from app.services.anomaly_detector import detect_anomalies_with_scores
 from app.services.scoring_engine import calculate_suspicion_scores
-from app.database import init_db, SessionLocal, SuspiciousHistory
+from app.schemas import UploadResponse, HistoryResponse, TransactionsPage
+from app.database import init_db, warm_history_cache, SessionLocal, SuspiciousHistory
 
 
 # =====================================================
@@ -47,93 +52,160 @@ REQUIRED_COLUMNS = [
     "timestamp"
 ]
 
+CSV_DTYPES = {
+    "transaction_id": "string",
+    "sender_id": "string",
+    "receiver_id": "string",
+    "amount": "float64"
+}
 
-# =====================================================
-# HEALTH CHECK
-# =====================================================
-@app.get("/")
-def health_check():
-    return {"status": "OK", "message": "MuleGuard AI Backend running 🚀"}
+# Bytes read from the request body per write when saving uploads
+UPLOAD_CHUNK_SIZE = 1 << 20
 
+# Rows returned per page by the transactions endpoint; also the Parquet
+# row group size, so a page read touches at most two row groups
+TRANSACTIONS_PAGE_SIZE = 500
 
-# =====================================================
-# UPLOAD ENDPOINT
-# =====================================================
-@app.post("/upload/")
-async def upload_file(file: UploadFile = File(...)):
-    start_time = time.time()
-    db = None
+# Stored upload transactions older than this are deleted on the next upload
+TRANSACTIONS_RETENTION_SECONDS = 24 * 60 * 60
 
-    try:
-        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-        file_path = os.path.join(UPLOAD_FOLDER, file.filename)
+# Rows per multi-row upsert, keeping bound parameters under SQLite's limit
+HISTORY_UPSERT_BATCH_SIZE = 200
 
-        # Save file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
 
-        # Read CSV
-        df = pd.read_csv(file_path)
+def transactions_path(file_id):
+    return os.path.join(UPLOAD_FOLDER, f"{file_id}.parquet")
 
-        # Validate required columns
-        missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
-        if missing_columns:
-            raise HTTPException(
-                status_code=400,
-                detail={
-                    "error": "Invalid CSV format",
-                    "missing_columns": missing_columns
-                }
-            )
 
-        # Convert timestamp safely
-        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+def purge_expired_transactions():
+    """
+    Deletes stored upload transactions past the retention window
+    """
 
-        if df["timestamp"].isnull().any():
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid timestamp format in CSV"
-            )
+    cutoff = time.time() - TRANSACTIONS_RETENTION_SECONDS
 
-        # =====================================================
-        # BUILD GRAPH
-        # =====================================================
-        G = build_transaction_graph(df)
+    for entry in os.scandir(UPLOAD_FOLDER):
+        if not entry.name.endswith(".parquet"):
+            continue
 
-        degree_centrality = nx.degree_centrality(G)
-        betweenness_centrality = nx.betweenness_centrality(G, normalized=True)
-        pagerank_scores = nx.pagerank(G)
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            # Already removed by a concurrent upload
+            continue
 
-        # =====================================================
-        # PATTERN DETECTION
-        # =====================================================
-        cycles = detect_cycles(G)
-        fraud_rings, suspicious_accounts = assign_ring_ids(cycles)
 
-        smurf_rings, smurf_accounts = detect_smurfing(df)
-        fraud_rings.extend(smurf_rings)
-        suspicious_accounts.extend(smurf_accounts)
+def read_transactions_page(path, offset, limit):
+    """
+    Reads rows [offset, offset + limit) from a stored upload, decoding
+    only the row groups that overlap that range
+    Returns:
+        transactions (DataFrame)
+        total_rows (int)
+    """
 
-        shell_rings, shell_accounts = detect_shell_chains(G)
-        fraud_rings.extend(shell_rings)
-        suspicious_accounts.extend(shell_accounts)
+    parquet_file = pq.ParquetFile(path)
+    metadata = parquet_file.metadata
 
-        # Remove duplicate accounts
-        unique_accounts = {}
-        for acc in suspicious_accounts:
-            unique_accounts[acc["account_id"]] = acc
-        suspicious_accounts = list(unique_accounts.values())
+    row_groups = []
+    first_group_start = None
+    group_start = 0
 
-        # =====================================================
-        # ANOMALY DETECTION
-        # =====================================================
-        anomaly_scores = detect_anomalies_with_scores(G, df)
+    for i in range(metadata.num_row_groups):
+        group_end = group_start + metadata.row_group(i).num_rows
 
-        # =====================================================
-        # DATABASE MEMORY
-        # =====================================================
-        db = SessionLocal()
+        if group_end > offset and group_start < offset + limit:
+            if first_group_start is None:
+                first_group_start = group_start
+            row_groups.append(i)
+
+        group_start = group_end
 
+    if not row_groups:
+        table = parquet_file.schema_arrow.empty_table()
+    else:
+        table = parquet_file.read_row_groups(row_groups).slice(
+            offset - first_group_start,
+            limit
+        )
+
+    return table.to_pandas(), metadata.num_rows
+
+
+# =====================================================
+# HEALTH CHECK
+# =====================================================
+@app.get("/")
+def health_check():
+    return {"status": "OK", "message": "MuleGuard AI Backend running 🚀"}
+
+
+# =====================================================
+# ANALYSIS PIPELINE
+# =====================================================
+def analyze_transactions(df, start_time):
+    """
+    Runs graph analytics, pattern detection and scoring on a
+    validated transaction DataFrame.
+    CPU-bound, so the upload endpoint runs it in a worker thread.
+    """
+
+    # =====================================================
+    # BUILD GRAPH
+    # =====================================================
+    G = build_transaction_graph(df)
+
+    # Degree tables shared by the detectors
+    in_degrees = dict(G.in_degree())
+    out_degrees = dict(G.out_degree())
+
+    (
+        degree_centrality,
+        betweenness_centrality,
+        pagerank_scores
+    ) = compute_centralities(G, df)
+
+    # =====================================================
+    # PATTERN DETECTION
+    # =====================================================
+    cycles = detect_cycles(G)
+    fraud_rings, cycle_accounts = assign_ring_ids(cycles)
+
+    smurf_rings, smurf_accounts = detect_smurfing(df)
+    fraud_rings.extend(smurf_rings)
+
+    shell_rings, shell_accounts = detect_shell_chains(G, in_degrees, out_degrees)
+    fraud_rings.extend(shell_rings)
+
+    # Merge duplicate accounts, keeping every detected pattern
+    merged_accounts = {}
+    for acc in cycle_accounts + smurf_accounts + shell_accounts:
+        merged = merged_accounts.setdefault(acc["account_id"], {
+            "account_id": acc["account_id"],
+            "detected_patterns": [],
+            "ring_id": acc.get("ring_id")
+        })
+        merged["detected_patterns"].extend(acc["detected_patterns"])
+
+    for merged in merged_accounts.values():
+        merged["detected_patterns"] = list(dict.fromkeys(merged["detected_patterns"]))
+
+    suspicious_accounts = list(merged_accounts.values())
+
+    # =====================================================
+    # ANOMALY DETECTION
+    # =====================================================
+    anomaly_scores = detect_anomalies_with_scores(
+        G, df, in_degrees, out_degrees
+    )
+
+    # =====================================================
+    # DATABASE MEMORY
+    # =====================================================
+    # One session and one transaction for scoring + history write;
+    # commits on success, rolls back and closes on error
+    with SessionLocal() as db, db.begin():
         suspicious_accounts = calculate_suspicion_scores(
             suspicious_accounts,
             df,
@@ -145,15 +217,20 @@ async def upload_file(file: UploadFile = File(...)):
         )
 
         # Dynamic threshold
+        scores = np.fromiter(
+            (acc["suspicion_score"] for acc in suspicious_accounts),
+            dtype=np.float64,
+            count=len(suspicious_accounts)
+        )
+
         if suspicious_accounts:
-            scores = [acc["suspicion_score"] for acc in suspicious_accounts]
-            dynamic_threshold = max(40, np.percentile(scores, 70))
+            dynamic_threshold = max(40.0, float(np.percentile(scores, 70)))
         else:
-            dynamic_threshold = 40
+            dynamic_threshold = 40.0
 
+        keep = scores >= dynamic_threshold
         suspicious_accounts = [
-            acc for acc in suspicious_accounts
-            if acc["suspicion_score"] >= dynamic_threshold
+            acc for acc, kept in zip(suspicious_accounts, keep) if kept
         ]
 
         # Clean rings
@@ -163,48 +240,126 @@ async def upload_file(file: UploadFile = File(...)):
             if any(member in valid_ids for member in ring["member_accounts"])
         ]
 
-        # Save history safely
-        for acc in suspicious_accounts:
-            record = db.query(SuspiciousHistory).filter(
-                SuspiciousHistory.account_id == acc["account_id"]
-            ).first()
+        # Save history safely (single upsert per batch)
+        flagged_at = datetime.utcnow()
+        payload = [
+            {
+                "account_id": acc["account_id"],
+                "last_score": acc["suspicion_score"],
+                "times_flagged": 1,
+                "last_flagged_at": flagged_at
+            }
+            for acc in suspicious_accounts
+        ]
 
-            if record:
-                record.last_score = acc["suspicion_score"]
-                record.times_flagged += 1
-            else:
-                db.add(SuspiciousHistory(
-                    account_id=acc["account_id"],
-                    last_score=acc["suspicion_score"],
-                    times_flagged=1
-                ))
+        for i in range(0, len(payload), HISTORY_UPSERT_BATCH_SIZE):
+            stmt = sqlite_insert(SuspiciousHistory).values(
+                payload[i:i + HISTORY_UPSERT_BATCH_SIZE]
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["account_id"],
+                set_={
+                    "last_score": stmt.excluded.last_score,
+                    "times_flagged": SuspiciousHistory.times_flagged + 1,
+                    "last_flagged_at": stmt.excluded.last_flagged_at
+                }
+            )
+            db.execute(stmt)
+
+    processing_time = round(time.time() - start_time, 2)
+
+    # =====================================================
+    # RESPONSE
+    # =====================================================
+    return {
+        "fraud_rings": fraud_rings,
+        "suspicious_accounts": suspicious_accounts,
+        "summary": {
+            "total_accounts_analyzed": G.number_of_nodes(),
+            "total_transactions": G.number_of_edges(),
+            "suspicious_accounts_flagged": len(suspicious_accounts),
+            "fraud_rings_detected": len(fraud_rings),
+            "processing_time_seconds": processing_time
+        },
+        "message": "Hybrid Fraud Intelligence Engine completed 🚀🔥"
+    }
 
-        db.commit()
 
-        processing_time = round(time.time() - start_time, 2)
+# =====================================================
+# UPLOAD ENDPOINT
+# =====================================================
+@app.post("/upload/", response_model=UploadResponse)
+async def upload_file(file: UploadFile = File(...)):
+    start_time = time.time()
+
+    try:
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        file_path = os.path.join(UPLOAD_FOLDER, file.filename)
+        file_id = uuid.uuid4().hex
+
+        # Warm the history table while the upload is saved and parsed
+        warmup = asyncio.create_task(asyncio.to_thread(warm_history_cache))
+
+        try:
+            # Save file
+            async with aiofiles.open(file_path, "wb") as buffer:
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    await buffer.write(chunk)
+
+            # Read CSV (pyarrow parses in parallel and infers ISO timestamps natively)
+            df, _ = await asyncio.gather(
+                asyncio.to_thread(
+                    pd.read_csv,
+                    file_path,
+                    engine="pyarrow",
+                    dtype=CSV_DTYPES
+                ),
+                warmup,
+                return_exceptions=True
+            )
+        finally:
+            # Don't leave the warm-up pending if saving the file failed
+            warmup.cancel()
 
-        # =====================================================
-        # FIX: JSON SERIALIZATION ISSUE
-        # Convert timestamp to string
-        # =====================================================
-        df["timestamp"] = df["timestamp"].astype(str)
+        if isinstance(df, BaseException):
+            raise df
+
+        # Validate required columns
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+        if missing_columns:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "error": "Invalid CSV format",
+                    "missing_columns": missing_columns
+                }
+            )
+
+        # Convert timestamp safely (no-op when pyarrow already parsed it)
+        df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+
+        if df["timestamp"].isnull().any():
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid timestamp format in CSV"
+            )
+
+        # Keep transactions on disk for paginated retrieval
+        await asyncio.to_thread(purge_expired_transactions)
+        await asyncio.to_thread(
+            df.to_parquet,
+            transactions_path(file_id),
+            index=False,
+            row_group_size=TRANSACTIONS_PAGE_SIZE
+        )
 
         # =====================================================
-        # RESPONSE
+        # ANALYSIS (off the event loop)
         # =====================================================
-        return JSONResponse({
-            "fraud_rings": fraud_rings,
-            "suspicious_accounts": suspicious_accounts,
-            "summary": {
-                "total_accounts_analyzed": G.number_of_nodes(),
-                "total_transactions": G.number_of_edges(),
-                "suspicious_accounts_flagged": len(suspicious_accounts),
-                "fraud_rings_detected": len(fraud_rings),
-                "processing_time_seconds": processing_time
-            },
-            "raw_transactions": df.to_dict(orient="records"),
-            "message": "Hybrid Fraud Intelligence Engine completed 🚀🔥"
-        })
+        result = await asyncio.to_thread(analyze_transactions, df, start_time)
+        result["transactions_url"] = f"/transactions/{file_id}"
+
+        return result
 
     except HTTPException as e:
         raise e
@@ -213,15 +368,11 @@ async def upload_file(file: UploadFile = File(...)):
         print("🔥 ERROR:", e)
         raise HTTPException(status_code=500, detail=str(e))
 
-    finally:
-        if db:
-            db.close()
-
 
 # =====================================================
 # HISTORY ENDPOINT
 # =====================================================
-@app.get("/history/")
+@app.get("/history/", response_model=HistoryResponse)
 def get_history():
     db = SessionLocal()
     try:
@@ -244,3 +395,33 @@ def get_history():
 
     finally:
         db.close()
+
+
+# =====================================================
+# TRANSACTIONS ENDPOINT
+# =====================================================
+@app.get("/transactions/{file_id}", response_model=TransactionsPage)
+def get_transactions(file_id: str, page: int = 1):
+    path = transactions_path(file_id)
+
+    if not file_id.isalnum() or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Upload not found")
+
+    if page < 1:
+        raise HTTPException(status_code=400, detail="page must be >= 1")
+
+    transactions, total = read_transactions_page(
+        path,
+        (page - 1) * TRANSACTIONS_PAGE_SIZE,
+        TRANSACTIONS_PAGE_SIZE
+    )
+    transactions["timestamp"] = transactions["timestamp"].astype(str)
+
+    return {
+        "file_id": file_id,
+        "page": page,
+        "page_size": TRANSACTIONS_PAGE_SIZE,
+        "total_transactions": total,
+        "total_pages": (total + TRANSACTIONS_PAGE_SIZE - 1) // TRANSACTIONS_PAGE_SIZE,
+        "transactions": transactions.to_dict(orient="records")
+    }
@@ -0,0 +1,66 @@
+from datetime import datetime
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+
+# =====================================================
+# UPLOAD RESPONSE
+# =====================================================
+class FraudRing(BaseModel):
+    ring_id: str
+    member_accounts: list[str]
+    pattern_type: str
+
+
+class SuspiciousAccount(BaseModel):
+    account_id: str
+    detected_patterns: list[str]
+    ring_id: Optional[str] = None
+    suspicion_score: float
+    risk_level: str
+    explanation: str
+
+
+class UploadSummary(BaseModel):
+    total_accounts_analyzed: int
+    total_transactions: int
+    suspicious_accounts_flagged: int
+    fraud_rings_detected: int
+    processing_time_seconds: float
+
+
+class UploadResponse(BaseModel):
+    fraud_rings: list[FraudRing]
+    suspicious_accounts: list[SuspiciousAccount]
+    summary: UploadSummary
+    transactions_url: str
+    message: str
+
+
+# =====================================================
+# HISTORY RESPONSE
+# =====================================================
+class HistoryRecord(BaseModel):
+    account_id: Optional[str] = None
+    last_score: Optional[float] = None
+    times_flagged: Optional[int] = None
+    last_flagged_at: Optional[datetime] = None
+
+
+class HistoryResponse(BaseModel):
+    total_records: int
+    history: list[HistoryRecord]
+
+
+# =====================================================
+# TRANSACTIONS RESPONSE
+# =====================================================
+class TransactionsPage(BaseModel):
+    file_id: str
+    page: int
+    page_size: int
+    total_transactions: int
+    total_pages: int
+    # Rows keep every column from the uploaded CSV
+    transactions: list[dict[str, Any]]
@@ -1,39 +1,110 @@
 import numpy as np
 from sklearn.ensemble import IsolationForest
 
-def detect_anomalies_with_scores(G, df):
+# "robust_zscore" (closed-form, default) or "isolation_forest"
+ANOMALY_METHOD = "robust_zscore"
+
+# Expected share of anomalous accounts
+CONTAMINATION = 0.1
+
+# Robust z-score output range, matched to IsolationForest's observed
+# decision_function values (anomalous accounts rarely go below -0.2)
+ZSCORE_MAX_ANOMALY = 0.2
+ZSCORE_MAX_NORMAL = 0.1
+
+
+def detect_anomalies_with_scores(
+    G,
+    df,
+    in_degrees,
+    out_degrees,
+    method=ANOMALY_METHOD
+):
+    """
+    Scores every account in G; negative scores are anomalous.
+    """
 
     accounts = list(G.nodes())
-    features = []
 
-    for account in accounts:
+    if not accounts:
+        return {}
+
+    # Aggregate sent / received amounts in one pass each
+    sent_totals = df.groupby("sender_id")["amount"].sum()
+    received_totals = df.groupby("receiver_id")["amount"].sum()
+
+    in_degree = np.fromiter(
+        (in_degrees[account] for account in accounts),
+        dtype=np.int64,
+        count=len(accounts)
+    )
+    out_degree = np.fromiter(
+        (out_degrees[account] for account in accounts),
+        dtype=np.int64,
+        count=len(accounts)
+    )
+
+    sent_amount = sent_totals.reindex(accounts, fill_value=0).to_numpy()
+    received_amount = received_totals.reindex(accounts, fill_value=0).to_numpy()
+
+    transaction_count = in_degree + out_degree
+
+    features = np.column_stack([
+        in_degree,
+        out_degree,
+        sent_amount,
+        received_amount,
+        transaction_count
+    ])
+
+    if method == "isolation_forest":
+        # float32 halves memory traffic (sklearn's trees use float32
+        # internally anyway); 64 trees are plenty for 5 features and
+        # are built in parallel across cores
+        features = np.asarray(features, dtype=np.float32)
 
-        in_degree = G.in_degree(account)
-        out_degree = G.out_degree(account)
+        model = IsolationForest(
+            contamination=CONTAMINATION,
+            random_state=42,
+            n_jobs=-1,
+            n_estimators=64
+        )
+        model.fit(features)
 
-        sent_amount = df[df["sender_id"] == account]["amount"].sum()
-        received_amount = df[df["receiver_id"] == account]["amount"].sum()
+        anomaly_scores = model.decision_function(features)
+    else:
+        anomaly_scores = _robust_zscore_scores(features)
 
-        transaction_count = in_degree + out_degree
+    return dict(zip(accounts, anomaly_scores))
 
-        features.append([
-            in_degree,
-            out_degree,
-            sent_amount,
-            received_amount,
-            transaction_count
-        ])
 
-    features = np.array(features)
+def _robust_zscore_scores(features):
+    """
+    Median/MAD distance from the typical account, mapped onto the
+    magnitudes IsolationForest's decision_function produces on these
+    features: the top CONTAMINATION share of accounts score below 0,
+    an account twice the cutoff distance scores -0.1, and scores
+    approach but never reach -ZSCORE_MAX_ANOMALY (-0.2, a boost of at
+    most 10 points in the scoring engine).
+    """
 
-    model = IsolationForest(contamination=0.1, random_state=42)
-    model.fit(features)
+    features = np.asarray(features, dtype=float)
 
-    anomaly_scores = model.decision_function(features)
+    median = np.median(features, axis=0)
+    mad = np.median(np.abs(features - median), axis=0)
 
-    anomaly_dict = {}
+    # Degree features are often constant for most accounts (MAD of 0);
+    # fall back to the standard deviation so one step doesn't dominate
+    scale = np.where(mad > 0, mad, features.std(axis=0)) + 1e-9
+    distance = np.linalg.norm((features - median) / scale, axis=1)
 
-    for i, account in enumerate(accounts):
-        anomaly_dict[account] = anomaly_scores[i]
+    cutoff = np.quantile(distance, 1 - CONTAMINATION) + 1e-9
+    ratio = distance / cutoff
 
-    return anomaly_dict
+    # Saturating map: (1 - 1/ratio) grows from 0 at the cutoff towards 1
+    # for extreme outliers; inliers get small positive scores
+    return np.where(
+        ratio > 1,
+        -ZSCORE_MAX_ANOMALY * (1 - 1 / np.maximum(ratio, 1)),
+        ZSCORE_MAX_NORMAL * (1 - ratio)
+    )
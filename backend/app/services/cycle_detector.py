@@ -6,12 +6,18 @@ def detect_cycles(G, min_length=3, max_length=5):
     Returns list of cycles
     """
 
-    cycles = list(nx.simple_cycles(G))
-
     filtered_cycles = []
 
-    for cycle in cycles:
-        if min_length <= len(cycle) <= max_length:
-            filtered_cycles.append(cycle)
+    # Cycles never cross strongly connected components, so search each
+    # component separately and let length_bound prune longer paths
+    for component in nx.strongly_connected_components(G):
+        if len(component) < min_length:
+            continue
+
+        subgraph = G.subgraph(component)
+
+        for cycle in nx.simple_cycles(subgraph, length_bound=max_length):
+            if len(cycle) >= min_length:
+                filtered_cycles.append(cycle)
 
     return filtered_cycles
@@ -7,22 +7,16 @@ def build_transaction_graph(df):
 
     G = nx.DiGraph()
 
-    for _, row in df.iterrows():
-        sender = row["sender_id"]
-        receiver = row["receiver_id"]
-        amount = row["amount"]
-        timestamp = row["timestamp"]
+    senders = df["sender_id"].to_numpy()
+    receivers = df["receiver_id"].to_numpy()
+    amounts = df["amount"].to_numpy()
+    timestamps = df["timestamp"].to_numpy()
 
-        # Add nodes
-        G.add_node(sender)
-        G.add_node(receiver)
-
-        # Add edge with attributes
-        G.add_edge(
-            sender,
-            receiver,
-            amount=amount,
-            timestamp=timestamp
-        )
+    # Bulk-add edges with attributes (nodes are created implicitly)
+    G.add_edges_from(
+        (sender, receiver, {"amount": amount, "timestamp": timestamp})
+        for sender, receiver, amount, timestamp
+        in zip(senders, receivers, amounts, timestamps)
+    )
 
     return G
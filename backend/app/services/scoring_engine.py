@@ -1,5 +1,10 @@
+import pandas as pd
+
 from app.database import SuspiciousHistory
 
+# Keep IN (...) lists under SQLite's bound-parameter limit
+HISTORY_LOOKUP_BATCH_SIZE = 500
+
 
 def calculate_suspicion_scores(
     suspicious_accounts,
@@ -23,14 +28,25 @@ def calculate_suspicion_scores(
     # ------------------------------------------------
     # Calculate transaction counts
     # ------------------------------------------------
-    transaction_counts = {}
+    transaction_counts = pd.concat(
+        [df["sender_id"], df["receiver_id"]],
+        ignore_index=True
+    ).value_counts()
+
+    # ------------------------------------------------
+    # Load suspicion history for all accounts up front
+    # ------------------------------------------------
+    account_ids = [account["account_id"] for account in suspicious_accounts]
+    history_map = {}
 
-    for _, row in df.iterrows():
-        sender = row["sender_id"]
-        receiver = row["receiver_id"]
+    for i in range(0, len(account_ids), HISTORY_LOOKUP_BATCH_SIZE):
+        batch = account_ids[i:i + HISTORY_LOOKUP_BATCH_SIZE]
+        records = db.query(SuspiciousHistory).filter(
+            SuspiciousHistory.account_id.in_(batch)
+        ).all()
 
-        transaction_counts[sender] = transaction_counts.get(sender, 0) + 1
-        transaction_counts[receiver] = transaction_counts.get(receiver, 0) + 1
+        for record in records:
+            history_map[record.account_id] = record
 
     # ------------------------------------------------
     # Score each suspicious account
@@ -69,7 +85,7 @@ def calculate_suspicion_scores(
 
         anomaly_value = anomaly_scores.get(account_id, 0)
 
-        # IsolationForest: negative = more anomalous
+        # Anomaly detector: negative = more anomalous
         if anomaly_value < 0:
             anomaly_boost = abs(anomaly_value) * 50
             raw_score += anomaly_boost
@@ -87,6 +103,10 @@ def calculate_suspicion_scores(
             raw_score += 5
             explanation_parts.append("High connectivity in transaction graph")
 
+        # Betweenness is estimated from k=BETWEENNESS_SAMPLE_SIZE sampled
+        # sources on graphs above BETWEENNESS_EXACT_MAX_NODES accounts
+        # (see centrality.py); the relative error is on the order of
+        # 1/sqrt(k), so only accounts near 0.05 may flip this boost.
         if bet > 0.05:
             raw_score += 10
             explanation_parts.append("Acts as bridge between transaction paths")
@@ -107,9 +127,7 @@ def calculate_suspicion_scores(
         # Persistent Suspicion Memory Boost
         # ------------------------------------------------
 
-        history_record = db.query(SuspiciousHistory).filter(
-            SuspiciousHistory.account_id == account_id
-        ).first()
+        history_record = history_map.get(account_id)
 
         if history_record:
             memory_boost = history_record.times_flagged * 5
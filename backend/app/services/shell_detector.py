@@ -1,6 +1,4 @@
-import networkx as nx
-
-def detect_shell_chains(G, min_length=4):
+def detect_shell_chains(G, in_degrees, out_degrees, min_length=4, cutoff=6):
     """
     Detects shell layering chains.
     Returns:
@@ -12,42 +10,63 @@ def detect_shell_chains(G, min_length=4):
     suspicious_accounts = []
     ring_counter = 1
 
-    # Find all simple paths up to length 6
+    # Only low-degree accounts can act as intermediate shells
+    low_degree = {
+        node for node in G.nodes()
+        if in_degrees[node] <= 2 and out_degrees[node] <= 2
+    }
+
+    # Walk simple paths of up to `cutoff` hops from every source,
+    # only passing through low-degree intermediate nodes
     for source in G.nodes():
-        for target in G.nodes():
-            if source != target:
-                try:
-                    paths = nx.all_simple_paths(G, source, target, cutoff=6)
-                    for path in paths:
-                        if len(path) >= min_length:
-
-                            # Check intermediate nodes (excluding first and last)
-                            intermediate_nodes = path[1:-1]
-
-                            valid_shell = True
-                            for node in intermediate_nodes:
-                                if G.in_degree(node) > 2 or G.out_degree(node) > 2:
-                                    valid_shell = False
-                                    break
-
-                            if valid_shell:
-                                ring_id = f"SHELL_{ring_counter:03d}"
-                                ring_counter += 1
-
-                                shell_rings.append({
-                                    "ring_id": ring_id,
-                                    "member_accounts": path,
-                                    "pattern_type": "shell_chain"
-                                })
-
-                                for account in path:
-                                    suspicious_accounts.append({
-                                        "account_id": account,
-                                        "detected_patterns": ["shell_chain"],
-                                        "ring_id": ring_id
-                                    })
-
-                except nx.NetworkXNoPath:
-                    continue
+        for path in _shell_paths(G, source, low_degree, min_length, cutoff):
+            ring_id = f"SHELL_{ring_counter:03d}"
+            ring_counter += 1
+
+            shell_rings.append({
+                "ring_id": ring_id,
+                "member_accounts": path,
+                "pattern_type": "shell_chain"
+            })
+
+            for account in path:
+                suspicious_accounts.append({
+                    "account_id": account,
+                    "detected_patterns": ["shell_chain"],
+                    "ring_id": ring_id
+                })
 
     return shell_rings, suspicious_accounts
+
+
+def _shell_paths(G, source, low_degree, min_length, cutoff):
+    """
+    Yields simple paths starting at source whose intermediate nodes
+    are all in low_degree, with at least min_length nodes and at most
+    cutoff edges
+    """
+
+    path = [source]
+    visited = {source}
+    stack = [iter(G.successors(source))]
+
+    while stack:
+        child = next(stack[-1], None)
+
+        if child is None:
+            stack.pop()
+            visited.discard(path.pop())
+            continue
+
+        if child in visited:
+            continue
+
+        # Any account may terminate the chain
+        if len(path) + 1 >= min_length:
+            yield path + [child]
+
+        # Only low-degree accounts may be extended through
+        if child in low_degree and len(path) < cutoff:
+            path.append(child)
+            visited.add(child)
+            stack.append(iter(G.successors(child)))
@@ -1,5 +1,4 @@
-from collections import defaultdict
-from datetime import timedelta
+import pandas as pd
 
 def detect_smurfing(df, min_senders=5, time_window_hours=72):
     """
@@ -10,36 +9,37 @@ def detect_smurfing(df, min_senders=5, time_window_hours=72):
     smurf_rings = []
     suspicious_accounts = {}
 
+    # One aggregation pass over all receivers
     grouped = df.groupby("receiver_id")
-
-    ring_counter = 1
-
-    for receiver, group in grouped:
-        unique_senders = group["sender_id"].unique()
-
-        if len(unique_senders) >= min_senders:
-            timestamps = group["timestamp"].sort_values()
-
-            time_diff = timestamps.max() - timestamps.min()
-
-            if time_diff <= timedelta(hours=time_window_hours):
-
-                ring_id = f"SMURF_{ring_counter:03d}"
-                ring_counter += 1
-
-                ring_members = list(unique_senders) + [receiver]
-
-                smurf_rings.append({
-                    "ring_id": ring_id,
-                    "member_accounts": ring_members,
-                    "pattern_type": "smurfing"
-                })
-
-                for account in ring_members:
-                    suspicious_accounts[account] = {
-                        "account_id": account,
-                        "detected_patterns": ["smurfing"],
-                        "ring_id": ring_id
-                    }
+    stats = grouped.agg(
+        n_senders=("sender_id", "nunique"),
+        first_seen=("timestamp", "min"),
+        last_seen=("timestamp", "max")
+    )
+    senders_by_receiver = grouped["sender_id"].unique()
+
+    mask = (
+        (stats["n_senders"] >= min_senders)
+        & (stats["last_seen"] - stats["first_seen"]
+           <= pd.Timedelta(hours=time_window_hours))
+    )
+
+    for ring_counter, receiver in enumerate(stats.index[mask], start=1):
+        ring_id = f"SMURF_{ring_counter:03d}"
+
+        ring_members = list(senders_by_receiver[receiver]) + [receiver]
+
+        smurf_rings.append({
+            "ring_id": ring_id,
+            "member_accounts": ring_members,
+            "pattern_type": "smurfing"
+        })
+
+        for account in ring_members:
+            suspicious_accounts[account] = {
+                "account_id": account,
+                "detected_patterns": ["smurfing"],
+                "ring_id": ring_id
+            }
 
     return smurf_rings, list(suspicious_accounts.values())